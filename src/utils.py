@@ -1,17 +1,147 @@
+import asyncio
+import concurrent.futures
+import copy
 import json
+import logging
+import functools
+import sys
+import time
 import boto3
-from datetime import datetime
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from datetime import datetime, timezone
 
-cloudformation = boto3.client('cloudformation')
-dynamodb_resource = boto3.resource('dynamodb')
-bedrock_ag = boto3.client('bedrock-agent')
-bedrock_agent_runtime = boto3.client('bedrock-agent-runtime')
+logger = logging.getLogger(__name__)
 
+# Shared client configuration: keep connections alive and reuse them across calls
+boto_config = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={'max_attempts': 10, 'mode': 'adaptive'}
+)
 
-def create_base_infrastructure(solution_id):
-    # Read the YAML template file
+# Clients are created on first use so callers only pay for the services they touch
+@functools.lru_cache(maxsize=None)
+def _client(service_name):
+    return boto3.client(service_name, config=boto_config)
+
+
+@functools.lru_cache(maxsize=None)
+def _resource(service_name):
+    return boto3.resource(service_name, config=boto_config)
+
+
+# Flow definition shared by create and update: input node -> prompt node -> output node.
+# The prompt node's promptArn is filled in per call by _flow_definition.
+_FLOW_DEFINITION_TEMPLATE = {
+    "connections": [
+        {
+            "configuration": {
+                "data": {
+                    "sourceOutput": "modelCompletion",
+                    "targetInput": "document"
+                }
+            },
+            "name": "Prompt_1PromptsNode0ToFlowOutputNodeFlowOutputNode0",
+            "source": "Prompt_1",
+            "target": "FlowOutputNode",
+            "type": "Data"
+        },
+        {
+            "configuration": {
+                "data": {
+                    "sourceOutput": "document",
+                    "targetInput": "input_text"
+                }
+            },
+            "name": "FlowInputNodeFlowInputNode0ToPrompt_1PromptsNode0",
+            "source": "FlowInputNode",
+            "target": "Prompt_1",
+            "type": "Data"
+        }
+    ],
+    "nodes": [
+        {
+            "configuration": {
+                "input": {}
+            },
+            "name": "FlowInputNode",
+            "outputs": [
+                {
+                    "name": "document",
+                    "type": "String"
+                }
+            ],
+            "type": "Input"
+        },
+        {
+            "configuration": {
+                "output": {}
+            },
+            "inputs": [
+                {
+                    "expression": "$.data",
+                    "name": "document",
+                    "type": "String"
+                }
+            ],
+            "name": "FlowOutputNode",
+            "type": "Output"
+        },
+        {
+            "configuration": {
+                "prompt": {
+                    "sourceConfiguration": {
+                        "resource": {
+                            "promptArn": None
+                        }
+                    }
+                }
+            },
+            "inputs": [
+                {
+                    "expression": "$.data",
+                    "name": "input_text",
+                    "type": "String"
+                }
+            ],
+            "name": "Prompt_1",
+            "outputs": [
+                {
+                    "name": "modelCompletion",
+                    "type": "String"
+                }
+            ],
+            "type": "Prompt"
+        }
+    ]
+}
+
+
+def _flow_definition(prompt_arn):
+    definition = copy.deepcopy(_FLOW_DEFINITION_TEMPLATE)
+    for node in definition['nodes']:
+        if node['type'] == 'Prompt':
+            node['configuration']['prompt']['sourceConfiguration']['resource']['promptArn'] = prompt_arn
+    return definition
+
+
+@functools.lru_cache(maxsize=8)
+def _table(name):
+    # Reuse the Table resource across calls instead of rebuilding it each time
+    return _resource('dynamodb').Table(name)
+
+
+@functools.lru_cache(maxsize=1)
+def _template_body():
+    # Read the YAML template file once and reuse it for every stack
     with open('src/base-infra.yaml', 'r') as f:
-        template_body = f.read()
+        return f.read()
+
+
+def create_base_infrastructure(solution_id):
+    cloudformation = _client('cloudformation')
+    template_body = _template_body()
 
     # Define the stack parameters
     stack_parameters = [
@@ -33,16 +163,17 @@ def create_base_infrastructure(solution_id):
     stack_id = response['StackId']
     print(f'Creating stack {stack_name} ({stack_id})')
 
-    # Wait for the stack to be created
+    # Wait for the stack to be created, polling every 5 seconds for up to 1 hour
     waiter = cloudformation.get_waiter('stack_create_complete')
-    waiter.wait(StackName=stack_id)
+    waiter.wait(StackName=stack_id, WaiterConfig={'Delay': 5, 'MaxAttempts': 720})
 
     # Get the stack outputs
     stack_outputs = cloudformation.describe_stacks(StackName=stack_id)['Stacks'][0]['Outputs']
 
     # Extract the output values into variables
-    dynamo_table = next((output['OutputValue'] for output in stack_outputs if output['OutputKey'] == 'DynamoDBTableName'), None)
-    sns_topic = next((output['OutputValue'] for output in stack_outputs if output['OutputKey'] == 'SNSTopicArn'), None)
+    outputs = {output['OutputKey']: output['OutputValue'] for output in stack_outputs}
+    dynamo_table = outputs.get('DynamoDBTableName')
+    sns_topic = outputs.get('SNSTopicArn')
 
     print('Stack outputs:')
     print(f'DynamoDB Table: {dynamo_table}')
@@ -51,6 +182,19 @@ def create_base_infrastructure(solution_id):
     return dynamo_table, sns_topic
 
 
+def _prompt_item(prompt_id, prompt_version, prompt_text):
+    # Build the DynamoDB item for a new prompt version awaiting approval
+    now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    return {
+        'promptId': prompt_id,
+        'version': str(prompt_version),
+        'promptText': prompt_text,
+        'status': 'Pending',
+        'createdAt': now,
+        'updatedAt': now
+    }
+
+
 def create_dynamodb_item(table, prompt_id, prompt_name, prompt_version, prompt_text):
     """
     Create a new item in a DynamoDB table for a prompt.
@@ -63,25 +207,89 @@ def create_dynamodb_item(table, prompt_id, prompt_name, prompt_version, prompt_t
         prompt_text (str): The text of the prompt.
 
     Returns:
-        bool: True if the item was successfully inserted, False otherwise.
+        str: A message describing the result of the insert. Existing prompt versions are not overwritten.
     """
+    item = _prompt_item(prompt_id, prompt_version, prompt_text)
     try:
-        item = {
-            'promptId': prompt_id,
-            'version': str(prompt_version),
-            'promptText': prompt_text,
-            'status': 'Pending',
-            'createdAt': str(datetime.now()),
-            'updatedAt': str(datetime.now())
-        }
-        dynamodb_table = dynamodb_resource.Table(table)
-        dynamodb_table.put_item(Item=item)
+        dynamodb_table = _table(table)
+        # Only insert if this prompt version is not in the table yet
+        dynamodb_table.put_item(
+            Item=item,
+            ConditionExpression='attribute_not_exists(promptId) AND attribute_not_exists(version)'
+        )
         return(f"Prompt '{prompt_name}' (version {prompt_version}) inserted successfully with status 'Pending'.")
-    
-    except Exception as e:
+
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return(f"Prompt '{prompt_name}' (version {prompt_version}) already exists.")
         return(f"Error inserting prompt: {e}")
 
 
+def _existing_prompt_keys(table, keys, retry_delay=0.05, max_retry_delay=5):
+    # Return the (promptId, version) keys that are already in the table, 100 keys per BatchGetItem call
+    existing = set()
+    for start in range(0, len(keys), 100):
+        request = {
+            table: {
+                'Keys': [{'promptId': prompt_id, 'version': version} for prompt_id, version in keys[start:start + 100]],
+                'ProjectionExpression': 'promptId, #version',
+                'ExpressionAttributeNames': {'#version': 'version'}
+            }
+        }
+        delay = retry_delay
+        while request:
+            response = _resource('dynamodb').batch_get_item(RequestItems=request)
+            for item in response['Responses'].get(table, []):
+                existing.add((item['promptId'], item['version']))
+            request = response.get('UnprocessedKeys')
+            if request:
+                # Unprocessed keys come back in a successful response, so botocore does not back off for us
+                time.sleep(delay)
+                delay = min(delay * 2, max_retry_delay)
+    return existing
+
+
+def create_dynamodb_items(table, prompts):
+    """
+    Create new items in a DynamoDB table for several prompts using batched writes.
+
+    Prompt versions that are already in the table are skipped, so an approved version is never
+    reset to 'Pending'. The existence check and the writes are separate requests, so a version
+    inserted concurrently between them can still be overwritten.
+
+    Args:
+        table (str): The name of the DynamoDB table.
+        prompts (list): Tuples of (prompt_id, prompt_name, prompt_version, prompt_text), one per prompt.
+
+    Returns:
+        str: A message describing the result of the insert.
+    """
+    # Drop repeated prompt versions, keeping the first occurrence
+    new_prompts = {}
+    for prompt_id, prompt_name, prompt_version, prompt_text in prompts:
+        new_prompts.setdefault((prompt_id, str(prompt_version)), prompt_text)
+
+    try:
+        existing = _existing_prompt_keys(table, list(new_prompts))
+        dynamodb_table = _table(table)
+        # batch_writer groups up to 25 puts per BatchWriteItem call and retries unprocessed items
+        with dynamodb_table.batch_writer() as batch:
+            for (prompt_id, prompt_version), prompt_text in new_prompts.items():
+                if (prompt_id, prompt_version) not in existing:
+                    batch.put_item(Item=_prompt_item(prompt_id, prompt_version, prompt_text))
+        return(f"{len(new_prompts) - len(existing)} prompts inserted successfully with status 'Pending', "
+               f"{len(existing)} already existed and were skipped.")
+
+    except ClientError as e:
+        return(f"Error inserting prompts: {e}")
+
+
+@functools.lru_cache(maxsize=1)
+def _account_id():
+    # The caller identity does not change within a session, so look it up once
+    return _client('sts').get_caller_identity()['Account']
+
+
 def create_bedrock_flow_role(role_name='MyBedrockFlowsRole'):
     """
     Create a new AWS IAM role for Bedrock Flows or use an existing role.
@@ -92,7 +300,7 @@ def create_bedrock_flow_role(role_name='MyBedrockFlowsRole'):
     Returns:
         str: The Amazon Resource Name (ARN) of the IAM role.
     """
-    iam = boto3.client('iam')
+    iam = _client('iam')
 
     try:
         # Create a new IAM role
@@ -123,129 +331,62 @@ def create_bedrock_flow_role(role_name='MyBedrockFlowsRole'):
 
     except iam.exceptions.EntityAlreadyExistsException:
         # Use an existing IAM role
-        flow_role_arn = f'arn:aws:iam::{iam.get_user()["User"]["Arn"].split(":")[4]}:role/{role_name}'
+        flow_role_arn = f'arn:aws:iam::{_account_id()}:role/{role_name}'
         print(f'Using existing IAM role: {flow_role_arn}')
 
     return flow_role_arn
 
 def create_bedrock_flow(flow_name, description, prompt_arn, flow_role_arn):
-    response = bedrock_ag.create_flow(
+    response = _client('bedrock-agent').create_flow(
         name=flow_name,
         description=description,
         executionRoleArn=flow_role_arn,
-        definition={
-            "connections": [
-                {
-                    "configuration": {
-                        "data": {
-                            "sourceOutput": "modelCompletion",
-                            "targetInput": "document"
-                        }
-                    },
-                    "name": "Prompt_1PromptsNode0ToFlowOutputNodeFlowOutputNode0",
-                    "source": "Prompt_1",
-                    "target": "FlowOutputNode",
-                    "type": "Data"
-                },
-                {
-                    "configuration": {
-                        "data": {
-                            "sourceOutput": "document",
-                            "targetInput": "input_text"
-                        }
-                    },
-                    "name": "FlowInputNodeFlowInputNode0ToPrompt_1PromptsNode0",
-                    "source": "FlowInputNode",
-                    "target": "Prompt_1",
-                    "type": "Data"
-                }
-            ],
-            "nodes": [
-                {
-                    "configuration": {
-                        "input": {}
-                    },
-                    "name": "FlowInputNode",
-                    "outputs": [
-                        {
-                            "name": "document",
-                            "type": "String"
-                        }
-                    ],
-                    "type": "Input"
-                },
-                {
-                    "configuration": {
-                        "output": {}
-                    },
-                    "inputs": [
-                        {
-                            "expression": "$.data",
-                            "name": "document",
-                            "type": "String"
-                        }
-                    ],
-                    "name": "FlowOutputNode",
-                    "type": "Output"
-                },
-                {
-                    "configuration": {
-                        "prompt": {
-                            "sourceConfiguration": {
-                                "resource": {
-                                    "promptArn": prompt_arn
-                                }
-                            }
-                        }
-                    },
-                    "inputs": [
-                        {
-                            "expression": "$.data",
-                            "name": "input_text",
-                            "type": "String"
-                        }
-                    ],
-                    "name": "Prompt_1",
-                    "outputs": [
-                        {
-                            "name": "modelCompletion",
-                            "type": "String"
-                        }
-                    ],
-                    "type": "Prompt"
-                }
-            ]
-        }
+        definition=_flow_definition(prompt_arn)
     )
 
     return response
 
+def _prepare_and_version(flow_id, flow_name, poll_interval=1, max_poll_interval=5, max_wait=300):
+    # Prepare the flow, wait until it is prepared, then create a new flow version and return it
+    bedrock_ag = _client('bedrock-agent')
+
+    print(f"[{flow_name}] Preparing the flow...")
+    prepare_flow_response = bedrock_ag.prepare_flow(flowIdentifier=flow_id)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("prepare_flow response: %s", json.dumps(prepare_flow_response, indent=2, default=str))
+
+    # Poll with a bounded backoff until the flow can be versioned
+    flow_status = prepare_flow_response["status"]
+    deadline = time.monotonic() + max_wait
+    while flow_status not in ("Prepared", "Failed") and time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        poll_interval = min(poll_interval * 2, max_poll_interval)
+        flow_status = bedrock_ag.get_flow(flowIdentifier=flow_id)["status"]
+    print(f"[{flow_name}] Status: {flow_status}")
+    if flow_status != "Prepared":
+        raise RuntimeError(f"Flow {flow_id} could not be prepared (status: {flow_status})")
+
+    print(f"[{flow_name}] Creating a flow version...")
+    create_flow_version_response = bedrock_ag.create_flow_version(flowIdentifier=flow_id)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("create_flow_version response: %s", json.dumps(create_flow_version_response, indent=2, default=str))
+
+    return create_flow_version_response["version"]
+
 def prepare_and_create_flow_alias(flow_name, flow_description, flow_role_arn, prompt_arn, flow_alias_description):
+    bedrock_ag = _client('bedrock-agent')
 
     # Create the flow
-    print("Creating the flow...")
+    print(f"[{flow_name}] Creating the flow...")
     create_flow_response = create_bedrock_flow(flow_name, flow_description, prompt_arn, flow_role_arn)
     flow_id = create_flow_response['id']
-    print(f"Flow created with ID: {flow_id}")
-
-    # Prepare the flow
-    print("Preparing the flow...")
-    prepare_flow_response = bedrock_ag.prepare_flow(flowIdentifier=flow_id)
-    print(json.dumps(prepare_flow_response, indent=2, default=str))
+    print(f"[{flow_name}] Flow created with ID: {flow_id}")
 
-    # Get the flow status
-    print("Getting the flow status...")
-    get_flow_response = bedrock_ag.get_flow(flowIdentifier=flow_id)
-    print("Status:", get_flow_response["status"])
-
-    # Create a flow version
-    print("Creating a flow version...")
-    create_flow_version_response = bedrock_ag.create_flow_version(flowIdentifier=flow_id)
-    print(json.dumps(create_flow_version_response, indent=2, default=str))
-    flow_version = create_flow_version_response["version"]
+    # Prepare the flow and create a flow version
+    flow_version = _prepare_and_version(flow_id, flow_name)
     
     # Create a flow alias
-    print("Creating a flow alias...")
+    print(f"[{flow_name}] Creating a flow alias...")
     create_flow_alias_response = bedrock_ag.create_flow_alias(
         flowIdentifier=flow_id,
         name=flow_name,
@@ -256,13 +397,111 @@ def prepare_and_create_flow_alias(flow_name, flow_description, flow_role_arn, pr
             }
         ]
     )
-    print(json.dumps(create_flow_alias_response, indent=2, default=str))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("create_flow_alias response: %s", json.dumps(create_flow_alias_response, indent=2, default=str))
     flow_alias_id = create_flow_alias_response['id']
-    print("Flow creation complete. The alias id is: {}".format(flow_alias_id))
+    print(f"[{flow_name}] Flow creation complete. The alias id is: {flow_alias_id}")
 
     return flow_id, flow_alias_id
 
 
+async def prepare_and_create_flow_aliases(flows):
+    """
+    Create several flows with their aliases concurrently.
+
+    Each flow still runs its own create -> prepare -> version -> alias chain in order; only independent
+    flows overlap. The chains run on a dedicated thread pool no larger than the client connection pool.
+
+    Args:
+        flows (list): Dicts of keyword arguments for prepare_and_create_flow_alias, one per flow.
+
+    Returns:
+        list: (flow_id, flow_alias_id) tuples, in the same order as flows.
+
+    Raises:
+        Exception: The first error raised by a flow, once all flows have finished.
+    """
+    if not flows:
+        return []
+
+    # Create the client up front: client creation from worker threads is not thread-safe
+    _client('bedrock-agent')
+    loop = asyncio.get_running_loop()
+    max_workers = min(len(flows), boto_config.max_pool_connections)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        # Let every chain settle before raising, so no worker is still running when the pool is released
+        results = await asyncio.gather(*(
+            loop.run_in_executor(executor, functools.partial(prepare_and_create_flow_alias, **flow))
+            for flow in flows
+        ), return_exceptions=True)
+    finally:
+        # Never block the event loop waiting for worker threads
+        executor.shutdown(wait=False)
+
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+def enable_flow_auto_update(solution_id, flow_id, flow_alias_id):
+    """
+    Configure the flow update Lambda function so approved prompt versions are rolled out to the flow.
+
+    The Lambda function is triggered by the DynamoDB stream whenever a prompt version is set to 'Approved',
+    so the flow is updated without polling the prompt status.
+
+    Args:
+        solution_id (str): The ID of the solution used to create the base infrastructure.
+        flow_id (str): The ID of the flow to update.
+        flow_alias_id (str): The ID of the flow alias to route to the new flow version.
+    """
+    lambda_client = _client('lambda')
+    function_name = f'{solution_id}-update-flow'
+
+    function_config = lambda_client.get_function_configuration(FunctionName=function_name)
+    variables = function_config.get('Environment', {}).get('Variables', {})
+    variables.update({
+        'FLOW_ID': flow_id,
+        'FLOW_ALIAS_ID': flow_alias_id
+    })
+    lambda_client.update_function_configuration(
+        FunctionName=function_name,
+        Environment={'Variables': variables}
+    )
+    print(f'Flow {flow_id} will be updated automatically when a prompt version is approved.')
+
+
+def wait_for_flow_alias_update(flow_id, flow_alias_id, previous_version, poll_interval=5, max_wait=600):
+    """
+    Wait until a flow alias routes to a different flow version, e.g. after the flow update Lambda function
+    has rolled out an approved prompt version.
+
+    Args:
+        flow_id (str): The ID of the flow.
+        flow_alias_id (str): The ID of the flow alias.
+        previous_version (str): The flow version the alias routed to before the update.
+        poll_interval (int): Seconds to wait between checks. Default is 5.
+        max_wait (int): Maximum number of seconds to wait. Default is 600.
+
+    Returns:
+        str: The flow version the alias routes to, or None if it did not change within max_wait seconds.
+    """
+    bedrock_ag = _client('bedrock-agent')
+    deadline = time.monotonic() + max_wait
+    while True:
+        alias = bedrock_ag.get_flow_alias(flowIdentifier=flow_id, aliasIdentifier=flow_alias_id)
+        flow_version = alias['routingConfiguration'][0]['flowVersion']
+        if flow_version != previous_version:
+            print(f'Flow alias {flow_alias_id} now routes to flow version {flow_version}.')
+            return flow_version
+        if time.monotonic() >= deadline:
+            print(f'Flow alias {flow_alias_id} still routes to flow version {previous_version}. Flow not updated yet.')
+            return None
+        time.sleep(poll_interval)
+
+
 def get_prompt_status(table, prompt_id, version):
     """
     Retrieve the status of a prompt from a DynamoDB table.
@@ -276,7 +515,7 @@ def get_prompt_status(table, prompt_id, version):
         str: The status of the prompt, or None if the prompt is not found.
     """
     try:
-        dynamodb_table = dynamodb_resource.Table(table)
+        dynamodb_table = _table(table)
         response = dynamodb_table.get_item(
             Key={
                 'promptId': prompt_id,
@@ -288,120 +527,70 @@ def get_prompt_status(table, prompt_id, version):
             return item.get('status')
         else:
             return None
-    except Exception as e:
+    except ClientError as e:
         print(f"Error retrieving prompt status: {e}")
         return None
 
+def set_prompt_status(table, prompt_id, version, new_status, expected_status='Pending'):
+    """
+    Change the status of a prompt version if it currently has the expected status.
+
+    The check and the update happen in a single conditional update_item call, so concurrent
+    approvers cannot overwrite each other's decision.
+
+    Args:
+        table (str): The name of the DynamoDB table.
+        prompt_id (str): The ID of the prompt.
+        version (str): The version of the prompt.
+        new_status (str): The status to set, e.g. 'Approved' or 'Rejected'.
+        expected_status (str): The status the prompt version must currently have. Default is 'Pending'.
+
+    Returns:
+        bool: True if the status was changed, False otherwise.
+    """
+    try:
+        dynamodb_table = _table(table)
+        dynamodb_table.update_item(
+            Key={
+                'promptId': prompt_id,
+                'version': str(version)
+            },
+            UpdateExpression='SET #status = :new, updatedAt = :updated',
+            ConditionExpression='#status = :expected',
+            ExpressionAttributeNames={
+                '#status': 'status'
+            },
+            ExpressionAttributeValues={
+                ':new': new_status,
+                ':expected': expected_status,
+                ':updated': datetime.now(timezone.utc).isoformat(timespec='seconds')
+            }
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Prompt {prompt_id} (version {version}) is not '{expected_status}'. Status not updated.")
+        else:
+            print(f"Error updating prompt status: {e}")
+        return False
+
 def update_flow_prompt(flow_id, prompt_arn, prompt_id, prompt_version, flow_name, flow_description, flow_role_arn, dynamodb_table_name, flow_alias_id, flow_alias_description):
     prompt_status = get_prompt_status(dynamodb_table_name, prompt_id, prompt_version)
 
     if prompt_status == "Approved":
+        bedrock_ag = _client('bedrock-agent')
         prompt_v = "{}:{}".format(prompt_arn, prompt_version)
         response = bedrock_ag.update_flow(
-            definition={
-                "connections": [
-                    {
-                        "configuration": {
-                            "data": {
-                                "sourceOutput": "modelCompletion",
-                                "targetInput": "document"
-                            }
-                        },
-                        "name": "Prompt_1PromptsNode0ToFlowOutputNodeFlowOutputNode0",
-                        "source": "Prompt_1",
-                        "target": "FlowOutputNode",
-                        "type": "Data"
-                    },
-                    {
-                        "configuration": {
-                            "data": {
-                                "sourceOutput": "document",
-                                "targetInput": "input_text"
-                            }
-                        },
-                        "name": "FlowInputNodeFlowInputNode0ToPrompt_1PromptsNode0",
-                        "source": "FlowInputNode",
-                        "target": "Prompt_1",
-                        "type": "Data"
-                    }
-                ],
-                "nodes": [
-                    {
-                        "configuration": {
-                            "input": {}
-                        },
-                        "name": "FlowInputNode",
-                        "outputs": [
-                            {
-                                "name": "document",
-                                "type": "String"
-                            }
-                        ],
-                        "type": "Input"
-                    },
-                    {
-                        "configuration": {
-                            "output": {}
-                        },
-                        "inputs": [
-                            {
-                                "expression": "$.data",
-                                "name": "document",
-                                "type": "String"
-                            }
-                        ],
-                        "name": "FlowOutputNode",
-                        "type": "Output"
-                    },
-                    {
-                        "configuration": {
-                            "prompt": {
-                                "sourceConfiguration": {
-                                    "resource": {
-                                        "promptArn": prompt_v
-                                    }
-                                }
-                            }
-                        },
-                        "inputs": [
-                            {
-                                "expression": "$.data",
-                                "name": "input_text",
-                                "type": "String"
-                            }
-                        ],
-                        "name": "Prompt_1",
-                        "outputs": [
-                            {
-                                "name": "modelCompletion",
-                                "type": "String"
-                            }
-                        ],
-                        "type": "Prompt"
-                    }
-                ]
-            },
+            definition=_flow_definition(prompt_v),
             description=flow_description,
             executionRoleArn=flow_role_arn,
             flowIdentifier=flow_id,
             name=flow_name
         )
-        print(response)
+        logger.debug("update_flow response: %s", response)
 
-        # Prepare the flow
-        print("Preparing the flow...")
-        prepare_flow_response = bedrock_ag.prepare_flow(flowIdentifier=flow_id)
-        print(json.dumps(prepare_flow_response, indent=2, default=str))
-    
-        # Get the flow status
-        print("Getting the flow status...")
-        get_flow_response = bedrock_ag.get_flow(flowIdentifier=flow_id)
-        print("Status:", get_flow_response["status"])
-    
-        # Create a flow version
-        print("Creating a flow version...")
-        create_flow_version_response = bedrock_ag.create_flow_version(flowIdentifier=flow_id)
-        print(json.dumps(create_flow_version_response, indent=2, default=str))
+        # Prepare the flow and create a flow version
+        flow_version = _prepare_and_version(flow_id, flow_name)
 
         # Update alias
         update_alias_response = bedrock_ag.update_flow_alias(
@@ -411,7 +600,7 @@ def update_flow_prompt(flow_id, prompt_arn, prompt_id, prompt_version, flow_name
             name=flow_name,
             routingConfiguration=[
                 {
-                    'flowVersion': create_flow_version_response["version"]
+                    'flowVersion': flow_version
                 },
             ]
         )
@@ -419,8 +608,19 @@ def update_flow_prompt(flow_id, prompt_arn, prompt_id, prompt_version, flow_name
     else:
         print(f"Prompt status is '{prompt_status}'. Flow not updated.")
 
-def executePromptFlow(prompt, flow_id, flow_alias_id):
-    response = bedrock_agent_runtime.invoke_flow(
+def stream_prompt_flow(prompt, flow_id, flow_alias_id):
+    """
+    Invoke a flow and yield its output documents as they arrive.
+
+    Args:
+        prompt (str): The input document for the flow.
+        flow_id (str): The ID of the flow.
+        flow_alias_id (str): The ID of the flow alias to invoke.
+
+    Yields:
+        The content of each flow output event.
+    """
+    response = _client('bedrock-agent-runtime').invoke_flow(
         flowIdentifier = flow_id,
         flowAliasIdentifier = flow_alias_id,
         inputs = [
@@ -435,6 +635,12 @@ def executePromptFlow(prompt, flow_id, flow_alias_id):
     )
     event_stream = response["responseStream"]
     for event in event_stream:
-        if "flowOutputEvent" in event:
-            flow_response = event["flowOutputEvent"]["content"]["document"]
-            print(flow_response)
\ No newline at end of file
+        flow_output_event = event.get("flowOutputEvent")
+        if flow_output_event:
+            yield flow_output_event["content"]["document"]
+
+def executePromptFlow(prompt, flow_id, flow_alias_id):
+    # Buffer the output and flush stdout once instead of per event
+    for flow_response in stream_prompt_flow(prompt, flow_id, flow_alias_id):
+        sys.stdout.write(f"{flow_response}\n")
+    sys.stdout.flush()